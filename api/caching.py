@@ -0,0 +1,27 @@
+from uuid import uuid4
+
+from django.core.cache import cache
+
+HOBBIES_CACHE_KEY = 'hobbies_json_v2'
+SIMILAR_USERS_VERSION_KEY = 'simusers:version'
+
+
+def invalidate_hobbies() -> None:
+    '''Drop the cached hobby list so the next GET rebuilds it'''
+    cache.delete(HOBBIES_CACHE_KEY)
+
+
+def similar_users_version() -> str:
+    '''Token baked into every cached similar users page key'''
+    return cache.get_or_set(SIMILAR_USERS_VERSION_KEY, lambda: uuid4().hex, None)
+
+
+def invalidate_similar_users() -> None:
+    '''
+    Orphan every cached similar users page by rotating the version token, since
+    the cache API can't delete keys by prefix and one user's hobbies feed every
+    other user's ranking. The token lives in the shared cache from settings.CACHES,
+    so a rotation in one worker is seen by all of them; if it is ever culled, the
+    next read mints a fresh token, which only orphans pages
+    '''
+    cache.set(SIMILAR_USERS_VERSION_KEY, uuid4().hex, None)
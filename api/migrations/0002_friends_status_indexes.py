@@ -0,0 +1,26 @@
+# Generated by Django 5.1.1 on 2026-10-14 04:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='friends',
+            name='status',
+            field=models.CharField(choices=[('sent', 'Sent'), ('accepted', 'Accepted'), ('rejected', 'Rejected')], db_index=True, default='sent', max_length=10),
+        ),
+        migrations.AddIndex(
+            model_name='friends',
+            index=models.Index(fields=['from_user', 'status'], name='fr_from_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='friends',
+            index=models.Index(fields=['to_user', 'status'], name='fr_to_status_idx'),
+        ),
+    ]
@@ -1,7 +1,28 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.utils import timezone
-from typing import Dict, Any
+from django.utils.functional import cached_property
+from datetime import date, datetime
+from typing import Dict, Any, List, Optional
+
+
+def calculate_age(date_of_birth: date, today: date) -> int:
+    '''Age in whole years on the given day, so bulk callers can share one today'''
+    return today.year - date_of_birth.year - (
+        (today.month, today.day) <
+        (date_of_birth.month, date_of_birth.day)
+    )
+
+
+def format_date(d: date) -> str:
+    '''YYYY-MM-DD, built directly rather than through strftime'''
+    return f"{d.year:04d}-{d.month:02d}-{d.day:02d}"
+
+
+def format_datetime(dt: datetime) -> str:
+    '''YYYY-MM-DD HH:MM, built directly rather than through strftime'''
+    return f"{dt.year:04d}-{dt.month:02d}-{dt.day:02d} {dt.hour:02d}:{dt.minute:02d}"
+
 
 #Create your models here.
 class User(AbstractUser):
@@ -30,6 +51,7 @@ class User(AbstractUser):
     username = models.CharField(max_length=50, unique=True)
     email = models.EmailField(unique=True)
     date_of_birth = models.DateField(null=True)
+    updated_at = models.DateTimeField(auto_now=True)
     profile = models.OneToOneField(
         to='Profile',
         blank=True,
@@ -52,48 +74,69 @@ class User(AbstractUser):
 
     REQUIRED_FIELDS = ['email', 'first_name', 'last_name']
     
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-        if not hasattr(self, 'profile'):
-            Profile.objects.create(user=self)
-
     def __str__(self) -> str:
         return self.username
 
     def to_dict(self) -> Dict[str, Any]:
+        '''
+        Serialize the user. self.hobbies.all() reuses a prefetch_related('hobbies')
+        cache when present, so callers should prefetch hobbies to avoid a query here
+        '''
+        profile = getattr(self, 'user_profile', None)
         return {
             'id': self.id,
             'first_name': self.first_name,  
             'last_name': self.last_name,    
             'username': self.username,
             'email': self.email,
-            'date_of_birth': self.date_of_birth.strftime("%Y-%m-%d") if self.date_of_birth else None,
-            'profile': self.profile.to_dict() if self.profile else None,
+            'date_of_birth': format_date(self.date_of_birth) if self.date_of_birth else None,
+            'profile': profile.to_dict() if profile else None,
             'hobbies': [hobby.to_dict() for hobby in self.hobbies.all()],
             'age': self.age,
         }
 
-    @property
+    @cached_property
     def age(self) -> int:
         if self.date_of_birth:
-            today = timezone.now().date()
-            return today.year - self.date_of_birth.year - (
-                (today.month, today.day) < 
-                (self.date_of_birth.month, self.date_of_birth.day)
-            )
+            return calculate_age(self.date_of_birth, timezone.now().date())
         return 0
 
-    @property
+    @cached_property
     def friend_count(self) -> int:
         '''Count of confirmed friends'''
+        if hasattr(self, 'friend_count_db'):
+            return self.friend_count_db
         return Friends.objects.filter(
             (models.Q(from_user=self) | models.Q(to_user=self)) &
             models.Q(status='accepted')
         ).count()
 
+    @classmethod
+    def with_friend_counts(cls, qs: models.QuerySet) -> models.QuerySet:
+        '''Annotate a user queryset with friend_count_db so friend_count needs no query per user'''
+        return qs.annotate(
+            friend_count_db=models.Count(
+                'sent_requests',
+                filter=models.Q(sent_requests__status='accepted'),
+                distinct=True
+            ) + models.Count(
+                'received_requests',
+                filter=models.Q(received_requests__status='accepted'),
+                distinct=True
+            )
+        )
+
     def get_common_hobbies(self, other_user: 'User') -> int:
         '''Count number of hobbies in common with another user'''
-        return self.hobbies.filter(id__in=other_user.hobbies.all()).count()
+        if self._has_prefetched_hobbies() and other_user._has_prefetched_hobbies():
+            # Both hobby sets are already loaded, so intersect them without a query
+            own_ids = {hobby.id for hobby in self.hobbies.all()}
+            return len(own_ids.intersection(hobby.id for hobby in other_user.hobbies.all()))
+        other_ids = list(other_user.hobbies.values_list('id', flat=True))
+        return self.hobbies.filter(id__in=other_ids).count()
+
+    def _has_prefetched_hobbies(self) -> bool:
+        return 'hobbies' in getattr(self, '_prefetched_objects_cache', {})
 
 
 class Profile(models.Model):
@@ -113,6 +156,15 @@ class Profile(models.Model):
         return {}
 
 
+class HobbyManager(models.Manager):
+    '''
+    Default manager for hobbies that joins the creator, since to_dict always
+    reads created_by.username
+    '''
+    def get_queryset(self) -> models.QuerySet:
+        return super().get_queryset().select_related('created_by')
+
+
 class Hobby(models.Model):
     '''
     Hobby model to store available hobbies
@@ -126,6 +178,8 @@ class Hobby(models.Model):
         related_name='created_hobbies'
     )
 
+    objects = HobbyManager()
+
     class Meta:
         verbose_name_plural = "hobbies"
 
@@ -136,7 +190,7 @@ class Hobby(models.Model):
         return {
             'id': self.id,
             'name': self.name,
-            'created_at': self.created_at.strftime("%Y-%m-%d %H:%M"),
+            'created_at': format_datetime(self.created_at),
             'created_by': self.created_by.username if self.created_by else None,
         }
 
@@ -174,15 +228,51 @@ class Friends(models.Model):
     status = models.CharField(
         max_length=10,
         choices=STATUS_CHOICES,
-        default=SENT  
+        default=SENT,
+        db_index=True
     )
 
     class Meta:  
         verbose_name_plural = "Friends Requests"
+        indexes = [
+            models.Index(fields=['from_user', 'status'], name='fr_from_status_idx'),
+            models.Index(fields=['to_user', 'status'], name='fr_to_status_idx'),
+        ]
 
     def __str__(self):
         return f"Friend request from {self.from_user.username} to {self.to_user.username} ({self.status})"
     
+    @classmethod
+    def serialize_for_user(
+        cls, current_user: User, queryset: Optional[models.QuerySet] = None
+    ) -> List[Dict[str, Any]]:
+        '''
+        Serialize many requests as to_dict does, reading the usernames through
+        .values() so no Friends or User instances are built. Defaults to every
+        request the user sent or received
+        '''
+        if queryset is None:
+            queryset = cls.objects.filter(
+                models.Q(from_user=current_user) | models.Q(to_user=current_user)
+            )
+        rows = queryset.values(
+            'id', 'to_user_id', 'from_user__username', 'to_user__username', 'timestamp', 'status'
+        )
+        return [
+            {
+                'id': row['id'],
+                'friend_username': (
+                    row['from_user__username'] if row['to_user_id'] == current_user.id
+                    else row['to_user__username']
+                ),
+                'from_user': row['from_user__username'],
+                'to_user': row['to_user__username'],
+                'timestamp': format_datetime(row['timestamp']),
+                'status': row['status'],
+            }
+            for row in rows
+        ]
+
     def to_dict(self, current_user=None) -> Dict[str, Any]:
         friend_user = self.from_user if self.to_user == current_user else self.to_user
         return {
@@ -190,6 +280,6 @@ class Friends(models.Model):
             'friend_username': friend_user.username,  # This will show the friend's username
             'from_user': self.from_user.username,
             'to_user': self.to_user.username,
-            'timestamp': self.timestamp.strftime("%Y-%m-%d %H:%M"),
+            'timestamp': format_datetime(self.timestamp),
             'status': self.status,
         }
\ No newline at end of file
@@ -0,0 +1,85 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .caching import invalidate_hobbies, invalidate_similar_users
+from .models import User, Profile, Hobby
+
+
+@receiver(post_save, sender=User)
+def create_user_profile(sender, instance: User, created: bool, **kwargs) -> None:
+    '''
+    Create the profile for a newly registered user, once, on the initial INSERT.
+    Raw saves (loaddata) are skipped since fixtures carry their own profiles
+    '''
+    if created and not kwargs.get('raw'):
+        Profile.objects.create(user=instance)
+
+
+@receiver(post_save, sender=Hobby)
+@receiver(post_delete, sender=Hobby)
+def hobby_changed(sender, instance: Hobby, **kwargs) -> None:
+    '''Drop the cached hobby list whenever a hobby is created, edited or deleted'''
+    transaction.on_commit(invalidate_hobbies)
+    if not kwargs.get('created', True):
+        # An edited hobby is embedded in its users' cached profiles
+        User.objects.filter(hobbies=instance).update(updated_at=timezone.now())
+
+
+@receiver(pre_delete, sender=Hobby)
+def hobby_deleting(sender, instance: Hobby, **kwargs) -> None:
+    '''
+    Retire the cached profiles of a deleted hobby's users. This runs before the
+    delete because the through rows cascade away without sending m2m_changed
+    '''
+    User.objects.filter(hobbies=instance).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=User)
+def user_renamed(sender, instance: User, created: bool, update_fields=None, **kwargs) -> None:
+    '''
+    The hobby list and every profile holding one of this user's hobbies show the
+    creator's username, so retire them when an existing user is saved in a way that
+    may change it (not e.g. the last_login-only save at login)
+    '''
+    if not created and (update_fields is None or 'username' in update_fields):
+        transaction.on_commit(invalidate_hobbies)
+        User.objects.filter(hobbies__created_by=instance).update(updated_at=timezone.now())
+
+
+@receiver(pre_delete, sender=User)
+def user_deleting(sender, instance: User, **kwargs) -> None:
+    '''
+    A deleted creator's hobbies are SET_NULL by an UPDATE that sends no Hobby
+    post_save, so retire the hobby list and their users' profiles here. The
+    user also drops out of everyone's similar users pages
+    '''
+    transaction.on_commit(invalidate_hobbies)
+    transaction.on_commit(invalidate_similar_users)
+    User.objects.filter(hobbies__created_by=instance).update(updated_at=timezone.now())
+
+
+@receiver(m2m_changed, sender=User.hobbies.through)
+def user_hobbies_changed(sender, instance, action: str, reverse: bool, pk_set, **kwargs) -> None:
+    '''
+    Drop cached similar users pages whenever anyone's hobbies change, and move the
+    affected users' updated_at so their cached profile is retired too
+    '''
+    if reverse:
+        # instance is a Hobby; clearing it needs its users looked up before they go
+        if action == 'pre_clear':
+            users = User.objects.filter(hobbies=instance)
+        elif action in ('post_add', 'post_remove'):
+            users = User.objects.filter(pk__in=pk_set)
+        else:
+            users = None
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        users = User.objects.filter(pk=instance.pk)
+    else:
+        users = None
+
+    if users is not None:
+        users.update(updated_at=timezone.now())
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        transaction.on_commit(invalidate_similar_users)
@@ -7,7 +7,10 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.alert import Alert
 from django.contrib.auth import get_user_model
-from .models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from .models import User, Hobby
+import json
 import time
 
 class UserTests(StaticLiveServerTestCase):
@@ -284,3 +287,149 @@ class UserTests(StaticLiveServerTestCase):
             )
             user.set_password(user_data["password"])
             user.save()
+
+
+@override_settings(CACHES={'default': {
+    'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    'LOCATION': 'api-cache-tests',
+}})
+class CachedResponseTests(TestCase):
+    """
+    Tests that the cached profile, hobby list and similar users responses change
+    as soon as the data they were built from does.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.creator = User.objects.create_user(username='creator', email='creator@example.com', date_of_birth='1991-01-01')
+        self.user = User.objects.create_user(username='testuser', email='testuser@example.com', date_of_birth='1990-01-01')
+        self.other = User.objects.create_user(username='otheruser', email='otheruser@example.com', date_of_birth='1992-01-01')
+        self.hobby = Hobby.objects.create(name='chess', created_by=self.creator)
+        self.user.hobbies.add(self.hobby)
+        self.client.force_login(self.user)
+
+    #Runs the request or change with the on_commit cache invalidations applied
+    def run_committed(self, func, *args, **kwargs):
+        with self.captureOnCommitCallbacks(execute=True):
+            return func(*args, **kwargs)
+
+    def get_json(self, url: str) -> dict:
+        response = self.run_committed(self.client.get, url)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.content)
+
+    def post_json(self, url: str, data: dict) -> dict:
+        response = self.run_committed(self.client.post, url, json.dumps(data), content_type='application/json')
+        return json.loads(response.content)
+
+    def profile_hobbies(self) -> list:
+        return [hobby['name'] for hobby in self.get_json('/api/profile/')['hobbies']]
+
+    def hobby_list(self) -> dict:
+        return {hobby['name']: hobby['created_by'] for hobby in self.get_json('/api/hobbies/')['hobbies']}
+
+    def similar_usernames(self) -> list:
+        page = self.get_json('/api/users/similar_with_filters/?page=1')
+        return [user['username'] for user in page['similar_users']]
+
+    def test_profile_follows_hobby_add_and_remove(self):
+        """
+        Adding and removing a hobby through the API shows up in the next profile response
+        """
+        hobby = Hobby.objects.create(name='tennis')
+        self.assertNotIn('tennis', self.profile_hobbies())
+
+        self.post_json('/api/profile/add_hobby', {'hobby_id': hobby.id})
+        self.assertIn('tennis', self.profile_hobbies())
+
+        self.post_json('/api/profile/delete_hobby', {'hobby_id': hobby.id})
+        self.assertNotIn('tennis', self.profile_hobbies())
+
+    def test_new_hobby_is_listed(self):
+        """
+        A hobby created through the API is in both the hobby list and the profile
+        """
+        self.assertNotIn('painting', self.hobby_list())
+        self.post_json('/api/hobbies/', {'name': 'painting'})
+        self.assertIn('painting', self.hobby_list())
+        self.assertIn('painting', self.profile_hobbies())
+
+    def test_hobby_rename(self):
+        """
+        Renaming a hobby updates the hobby list and the profiles that hold it
+        """
+        self.assertIn('chess', self.profile_hobbies())
+        self.assertIn('chess', self.hobby_list())
+
+        self.hobby.name = 'go'
+        self.run_committed(self.hobby.save)
+
+        self.assertEqual(self.profile_hobbies(), ['go'])
+        self.assertNotIn('chess', self.hobby_list())
+        self.assertIn('go', self.hobby_list())
+
+    def test_hobby_delete(self):
+        """
+        Deleting a hobby removes it from the hobby list and the profiles that held it
+        """
+        self.assertIn('chess', self.profile_hobbies())
+        self.assertIn('chess', self.hobby_list())
+
+        self.run_committed(self.hobby.delete)
+
+        self.assertEqual(self.profile_hobbies(), [])
+        self.assertNotIn('chess', self.hobby_list())
+
+    def test_creator_rename(self):
+        """
+        The new username of a hobby's creator shows in the hobby list and the profile
+        """
+        self.assertEqual(self.hobby_list()['chess'], 'creator')
+        self.get_json('/api/profile/')
+
+        self.creator.username = 'renamed'
+        self.run_committed(self.creator.save)
+
+        self.assertEqual(self.hobby_list()['chess'], 'renamed')
+        self.assertEqual(self.get_json('/api/profile/')['hobbies'][0]['created_by'], 'renamed')
+
+    def test_creator_delete(self):
+        """
+        Deleting a hobby's creator clears created_by in the hobby list and the profile
+        """
+        self.assertEqual(self.hobby_list()['chess'], 'creator')
+        self.get_json('/api/profile/')
+
+        self.run_committed(self.creator.delete)
+
+        self.assertIsNone(self.hobby_list()['chess'])
+        self.assertIsNone(self.get_json('/api/profile/')['hobbies'][0]['created_by'])
+
+    def test_similar_users_follow_other_users_hobbies(self):
+        """
+        Another user picking up one of our hobbies moves them up the similar users page
+        """
+        self.assertEqual(self.similar_usernames(), ['creator', 'otheruser'])
+
+        self.run_committed(self.other.hobbies.add, self.hobby)
+        self.assertEqual(self.similar_usernames(), ['otheruser', 'creator'])
+
+        self.run_committed(self.other.hobbies.remove, self.hobby)
+        self.assertEqual(self.similar_usernames(), ['creator', 'otheruser'])
+
+    def test_similar_users_drop_deleted_user(self):
+        """
+        A deleted user no longer appears on the similar users page
+        """
+        self.assertIn('otheruser', self.similar_usernames())
+        self.run_committed(self.other.delete)
+        self.assertEqual(self.similar_usernames(), ['creator'])
+
+    def test_similar_users_out_of_range_page(self):
+        """
+        Pages past either end are clamped to a real page
+        """
+        for page in (-5, 99):
+            response = self.get_json(f'/api/users/similar_with_filters/?page={page}')
+            self.assertEqual(response['page'], 1)
+            self.assertEqual(len(response['similar_users']), 2)
@@ -1,4 +1,4 @@
-from django.http import HttpResponse, HttpRequest, JsonResponse
+from django.http import HttpResponse, HttpRequest
 from django.shortcuts import render, redirect
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
@@ -6,22 +6,54 @@ from django.views.decorators.http import require_http_methods
 from django.shortcuts import get_object_or_404
 from django.conf import settings
 from django.db import models
-from django.core.paginator import Paginator
-from django.db.models import Count, Q
-from django.http import JsonResponse
+from django.core.cache import cache
+from django.db.models import Count, IntegerField, Max, Q, Value
 from datetime import date, timedelta
+from math import ceil
+from hashlib import blake2b
+from collections import defaultdict
 from django.contrib.auth import update_session_auth_hash
 
 from django.middleware.csrf import get_token
 from django.views.decorators.csrf import ensure_csrf_cookie
-import json
+from django.utils.functional import Promise
+import orjson
 
-from .models import User, Profile, Hobby, Friends
+from .models import User, Hobby, Friends, calculate_age, format_datetime
+from .caching import HOBBIES_CACHE_KEY, similar_users_version
 from .forms import (
     LoginForm, SignUpForm, UserUpdateForm, 
     HobbyForm, PasswordChangeCustomForm
 )
 
+HOBBIES_CACHE_TIMEOUT = 300  # seconds
+PROFILE_CACHE_TIMEOUT = 300  # seconds
+SIMILAR_USERS_PER_PAGE = 10
+SIMILAR_USERS_COUNT_TIMEOUT = 60  # seconds
+SIMILAR_USERS_CACHE_TIMEOUT = 120  # seconds
+
+def _json_default(obj):
+    """Encode the subclasses (e.g. form.errors, SafeString, choices) and lazy strings orjson can't"""
+    if isinstance(obj, dict):
+        return dict(obj)
+    if isinstance(obj, list):
+        return list(obj)
+    if isinstance(obj, (str, Promise)):
+        # str.__str__ yields an exact str; str() on e.g. a SafeString returns it unchanged
+        return str.__str__(str(obj))
+    if isinstance(obj, int):
+        return int(obj)
+        return str(obj)
+    raise TypeError
+
+def ojson(data, status=200) -> HttpResponse:
+    """JSON response encoded with orjson in place of JsonResponse"""
+    return HttpResponse(
+        orjson.dumps(data, default=_json_default, option=orjson.OPT_NAIVE_UTC | orjson.OPT_PASSTHROUGH_SUBCLASS),
+        status=status,
+        content_type='application/json'
+    )
+
 @ensure_csrf_cookie
 def main_spa(request: HttpRequest) -> HttpResponse:
     """Vue SPA entry point - only accessible after authentication"""
@@ -37,10 +69,8 @@ def signup_view(request):
     if request.method == 'POST':
         form = SignUpForm(request.POST)
         if form.is_valid():
+            # The post_save signal creates the associated profile
             user = form.save()
-            user.save()
-            # Create associated profile
-            Profile.objects.create(user=user)
             login(request, user)
             return redirect('home')
     else:
@@ -79,11 +109,23 @@ def logout_view(request):
 def profile_api(request):
     """API endpoint for profile operations"""
     if request.method == 'GET':
-        return JsonResponse(request.user.to_dict())
+        # Any save or hobby change moves updated_at, which retires the cached body
+        updated_at = int(request.user.updated_at.timestamp() * 1_000_000)
+        cache_key = f"userdict:{request.user.id}:{updated_at}"
+        body = cache.get(cache_key)
+        if body is None:
+            user = (
+                User.objects.select_related('user_profile')
+                .prefetch_related('hobbies')
+                .get(pk=request.user.pk)
+            )
+            body = orjson.dumps(user.to_dict())
+            cache.set(cache_key, body, PROFILE_CACHE_TIMEOUT)
+        return HttpResponse(body, content_type='application/json')
 
     if request.method == 'PUT':
         try:
-            data = json.loads(request.body)
+            data = orjson.loads(request.body)
 
             # Handle password change
             new_password = data.get('password')
@@ -95,20 +137,20 @@ def profile_api(request):
                 # Reauthenticate the user by updating the session
                 update_session_auth_hash(request, request.user)
                 
-                return JsonResponse({'status': 'success'})
+                return ojson({'status': 'success'})
 
-        except json.JSONDecodeError:
-            return JsonResponse({'status': 'error', 'message': 'Invalid JSON format'}, status=400)
+        except orjson.JSONDecodeError:
+            return ojson({'status': 'error', 'message': 'Invalid JSON format'}, status=400)
 
         form = UserUpdateForm(data, instance=request.user)
         if form.is_valid():
             form.save()
-            return JsonResponse({'status': 'success'}, status=200)
+            return ojson({'status': 'success'}, status=200)
         else:
             print(form.errors)
-            return JsonResponse({'status': 'error', 'errors': form.errors}, status=400)
+            return ojson({'status': 'error', 'errors': form.errors}, status=400)
 
-    return JsonResponse({'status': 'error', 'message': 'Method not allowed'}, status=405)
+    return ojson({'status': 'error', 'message': 'Method not allowed'}, status=405)
 
 
 @login_required
@@ -118,22 +160,39 @@ def password_change(request):
         form = PasswordChangeCustomForm(request.user, request.POST)
         if form.is_valid():
             form.save()
-            return JsonResponse({'status': 'success'})
-        return JsonResponse({'status': 'error', 'errors': form.errors})
-    return JsonResponse({'status': 'error', 'message': 'Invalid request method'})
+            return ojson({'status': 'success'})
+        return ojson({'status': 'error', 'errors': form.errors})
+    return ojson({'status': 'error', 'message': 'Invalid request method'})
 
 @login_required
 @require_http_methods(['GET', 'POST'])
 def hobby_api(request):
     """API endpoint for hobby operations"""
     if request.method == 'GET':
-        hobbies = Hobby.objects.all()
-        return JsonResponse({
-            'hobbies': [hobby.to_dict() for hobby in hobbies]
-        })
+        # Cached with a count/max id marker so added or deleted hobbies always show; signals.py clears edits
+        marker = tuple(Hobby.objects.aggregate(Count('id'), Max('id')).values())
+        cached = cache.get(HOBBIES_CACHE_KEY)
+        if cached is not None and cached[0] == marker:
+            body = cached[1]
+        else:
+            # Same payload as Hobby.to_dict, built straight from value rows
+            hobbies = Hobby.objects.values('id', 'name', 'created_at', 'created_by__username')
+            body = orjson.dumps({
+                'hobbies': [
+                    {
+                        'id': hobby['id'],
+                        'name': hobby['name'],
+                        'created_at': format_datetime(hobby['created_at']),
+                        'created_by': hobby['created_by__username'],
+                    }
+                    for hobby in hobbies
+                ]
+            })
+            cache.set(HOBBIES_CACHE_KEY, (marker, body), HOBBIES_CACHE_TIMEOUT)
+        return HttpResponse(body, content_type='application/json')
 
     # Handle POST request to create new hobby
-    data = json.loads(request.body)
+    data = orjson.loads(request.body)
     form = HobbyForm(data)
     if form.is_valid():
         hobby = form.save(commit=False)
@@ -141,42 +200,42 @@ def hobby_api(request):
         hobby.save()
         # Link the created hobby to the user
         request.user.hobbies.add(hobby)
-        return JsonResponse({'status': 'success', 'hobby': hobby.to_dict()})
-    return JsonResponse({'status': 'error', 'errors': form.errors})
+        return ojson({'status': 'success', 'hobby': hobby.to_dict()})
+    return ojson({'status': 'error', 'errors': form.errors})
 
 @login_required
 @require_http_methods(['POST'])
 def add_hobby_to_profile(request):
     """API endpoint to add an existing hobby to the user's profile"""
-    data = json.loads(request.body)
+    data = orjson.loads(request.body)
     hobby_id = data.get('hobby_id')
     if not hobby_id:
-        return JsonResponse({'status': 'error', 'errors': {'hobby_id': ['This field is required.']}})
+        return ojson({'status': 'error', 'errors': {'hobby_id': ['This field is required.']}})
 
     try:
         hobby = Hobby.objects.get(id=hobby_id)
     except Hobby.DoesNotExist:
-        return JsonResponse({'status': 'error', 'errors': {'hobby_id': ['Hobby not found.']}})
+        return ojson({'status': 'error', 'errors': {'hobby_id': ['Hobby not found.']}})
 
     request.user.hobbies.add(hobby)
-    return JsonResponse({'status': 'success'})
+    return ojson({'status': 'success'})
 
 @login_required
 @require_http_methods(['POST'])
 def delete_hobby_from_profile(request):
     """API endpoint to delete a hobby from the user's profile"""
-    data = json.loads(request.body)
+    data = orjson.loads(request.body)
     hobby_id = data.get('hobby_id')
     if not hobby_id:
-        return JsonResponse({'status': 'error', 'errors': {'hobby_id': ['This field is required.']}})
+        return ojson({'status': 'error', 'errors': {'hobby_id': ['This field is required.']}})
 
     try:
         hobby = Hobby.objects.get(id=hobby_id)
     except Hobby.DoesNotExist:
-        return JsonResponse({'status': 'error', 'errors': {'hobby_id': ['Hobby not found.']}})
+        return ojson({'status': 'error', 'errors': {'hobby_id': ['Hobby not found.']}})
 
     request.user.hobbies.remove(hobby)
-    return JsonResponse({'status': 'success'})
+    return ojson({'status': 'success'})
 
 @login_required
 def similar_users_with_filters_view(request):
@@ -184,6 +243,7 @@ def similar_users_with_filters_view(request):
     API view to find users with the most similar hobbies and filter by age, with pagination.
     """
     current_user = request.user
+    current_user_hobby_ids = list(current_user.hobbies.values_list('id', flat=True))
     min_age = int(request.GET.get("min_age", 0))
     max_age = int(request.GET.get("max_age", 100))
     page_number = int(request.GET.get("page", 1))
@@ -193,36 +253,78 @@ def similar_users_with_filters_view(request):
     min_birthdate = date(today.year - max_age - 1, today.month, today.day) + timedelta(days=1)
     max_birthdate = date(today.year - min_age, today.month, today.day)
 
-    # Query users, excluding the current user, and annotate with the number of common hobbies
-    similar_users = (
+    # Users in the age range, as dicts of just the page's columns so the GROUP BY stays narrow
+    candidates = (
         User.objects.exclude(id=current_user.id)
         .filter(date_of_birth__range=(min_birthdate, max_birthdate))  # Apply age filter
-        .annotate(common_hobbies=Count('hobbies', filter=Q(hobbies__in=current_user.hobbies.all())))
-        .order_by('-common_hobbies')  # Sort by most common hobbies first
+        .values('id', 'username', 'date_of_birth')
     )
 
-    # Paginate the results
-    paginator = Paginator(similar_users, 10)  # 10 users per page
-    page_obj = paginator.get_page(page_number)
-
-    # Convert results into a JSON-serializable format
-    similar_users_data = [
-        {
-            "username": user.username,
-            "common_hobbies": user.common_hobbies,
-            "age": user.age,
-            "hobbies": [hobby.name for hobby in user.hobbies.all()],
-        }
-        for user in page_obj.object_list
-    ]
-
-    return JsonResponse({
-        "page": page_obj.number,
-        "total_pages": paginator.num_pages,
-        "total_users": paginator.count,
-        "users_per_page": paginator.per_page,
-        "similar_users": similar_users_data,
+    # Annotate with the number of common hobbies
+    if current_user_hobby_ids:
+        similar_users = (
+            candidates
+            .annotate(common_hobbies=Count('hobbies', filter=Q(hobbies__in=current_user_hobby_ids)))
+            .order_by('-common_hobbies', 'id')  # Most common hobbies first, id keeps page slices stable
+        )
+    else:
+        # With no hobbies of our own every count is zero, so skip the JOIN and list in id order
+        similar_users = (
+            candidates
+            .annotate(common_hobbies=Value(0, output_field=IntegerField()))
+            .order_by('id')
+        )
+
+    # Plain COUNT without the hobbies aggregate, cached briefly for the page links
+    version = similar_users_version()
+    count_key = f"simusers_count:{version}:{current_user.id}:{min_birthdate}:{max_birthdate}"
+    total_users = cache.get_or_set(count_key, candidates.count, SIMILAR_USERS_COUNT_TIMEOUT)
+    total_pages = max(1, ceil(total_users / SIMILAR_USERS_PER_PAGE))
+    page_number = min(max(page_number, 1), total_pages)
+
+    # Serve a cached page when one exists; hobby changes rotate the version
+    hobby_hash = blake2b(repr(sorted(current_user_hobby_ids)).encode(), digest_size=8).hexdigest()
+    cache_key = (
+        f"simusers:{version}:{current_user.id}:{hobby_hash}:"
+        f"{min_birthdate}:{max_birthdate}:{page_number}"
+    )
+    body = cache.get(cache_key)
+    if body is not None:
+        return HttpResponse(body, content_type='application/json')
+
+    # Slice out the page, reading one extra row to know whether another page follows
+    offset = (page_number - 1) * SIMILAR_USERS_PER_PAGE
+    page_users = list(similar_users[offset:offset + SIMILAR_USERS_PER_PAGE + 1])
+    has_next = len(page_users) > SIMILAR_USERS_PER_PAGE
+    page_users = page_users[:SIMILAR_USERS_PER_PAGE]
+
+    # Fetch the hobby names for every user on the page in a single query
+    hobby_rows = Hobby.objects.filter(
+        users__id__in=[user['id'] for user in page_users]
+    ).values_list('users__id', 'name')
+    hobbies_by_user = defaultdict(list)
+    for user_id, hobby_name in hobby_rows:
+        hobbies_by_user[user_id].append(hobby_name)
+
+    # Encode the page once and cache it
+    body = orjson.dumps({
+        "page": page_number,
+        "total_pages": total_pages,
+        "total_users": total_users,
+        "users_per_page": SIMILAR_USERS_PER_PAGE,
+        "has_next": has_next,
+        "similar_users": [
+            {
+                "username": user['username'],
+                "common_hobbies": user['common_hobbies'],
+                "age": calculate_age(user['date_of_birth'], today),
+                "hobbies": hobbies_by_user[user['id']],
+            }
+            for user in page_users
+        ],
     })
+    cache.set(cache_key, body, SIMILAR_USERS_CACHE_TIMEOUT)
+    return HttpResponse(body, content_type='application/json')
 
 @login_required
 def friends_view(request):
@@ -231,28 +333,28 @@ def friends_view(request):
             (models.Q(from_user=request.user) | models.Q(to_user=request.user)) &
             models.Q(status='accepted')
         )
-        friends_data = [friend.to_dict(current_user=request.user) for friend in friends]
+        friends_data = Friends.serialize_for_user(request.user, friends)
         print(friends_data)
-        return JsonResponse({'status': 'success', 'friends': friends_data})
+        return ojson({'status': 'success', 'friends': friends_data})
 
 @login_required
 def get_friend_requests(request):
     if request.method == 'GET':
         friend_requests = Friends.objects.filter(to_user=request.user, status='sent')
-        requests_data = [fr.to_dict() for fr in friend_requests]
+        requests_data = Friends.serialize_for_user(request.user, friend_requests)
         print(requests_data)
-        return JsonResponse({'status': 'success', 'friend_requests': requests_data})
+        return ojson({'status': 'success', 'friend_requests': requests_data})
 
 @login_required
 @require_http_methods(['POST'])
 def send_request(request):
     """Send a friend request to another user."""
-    data = json.loads(request.body)
+    data = orjson.loads(request.body)
     username = data.get('username')
 
     recipient = User.objects.filter(username=username).first()
     if not recipient:
-        return JsonResponse({"status": "error", "message": "User not found"}, status=404)
+        return ojson({"status": "error", "message": "User not found"}, status=404)
 
     # Check if *either* direction already has a pending or accepted request
     existing_request = Friends.objects.filter(
@@ -262,40 +364,40 @@ def send_request(request):
     ).first()
 
     if existing_request:
-        return JsonResponse({"status": "success", "message": "Request already exists; doing nothing."}, status=200)
+        return ojson({"status": "success", "message": "Request already exists; doing nothing."}, status=200)
 
     Friends.objects.create(from_user=request.user, to_user=recipient, status='sent')
-    return JsonResponse({"status": "success", "message": f"Friend request sent to {username}"})
+    return ojson({"status": "success", "message": f"Friend request sent to {username}"})
 
 @login_required
 @require_http_methods(['POST'])
 def accept_request(request):
     """Accept a friend request."""
     if request.method == 'POST':
-        data = json.loads(request.body)
+        data = orjson.loads(request.body)
         request_id = data.get('request_id')
         friend_request = get_object_or_404(Friends, id=request_id, to_user=request.user, status='sent')
         friend_request.status = 'accepted'
         friend_request.save()
-        return JsonResponse({'status': 'success', 'message': 'Friend request accepted'})
+        return ojson({'status': 'success', 'message': 'Friend request accepted'})
 
 @login_required
 def reject_request(request):
     """Reject a friend request."""
     if request.method == 'POST':
-        data = json.loads(request.body)
+        data = orjson.loads(request.body)
         request_id = data.get('request_id')
         friend_request = get_object_or_404(Friends, id=request_id, to_user=request.user, status='sent')
 
         friend_request.status = 'rejected'
         friend_request.save()
-        return JsonResponse({'status': 'success', 'message': 'Friend request rejected'})
+        return ojson({'status': 'success', 'message': 'Friend request rejected'})
     else:
-        return JsonResponse({'status': 'error', 'message': 'Invalid request method'}, status=405)
+        return ojson({'status': 'error', 'message': 'Invalid request method'}, status=405)
 
 
 def get_csrf_token(request):
-    return JsonResponse({'csrfToken': get_token(request)})
+    return ojson({'csrfToken': get_token(request)})
 
 
 
@@ -31,6 +31,7 @@ export interface SimilarUser {
     total_pages: number;
     total_users: number;
     users_per_page: number;
+    has_next: boolean;
     similar_users: SimilarUser[];
   }
 
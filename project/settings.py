@@ -12,6 +12,9 @@ https://docs.djangoproject.com/en/stable/ref/settings/
 
 from . import database
 import os
+import sys
+import tempfile
+from hashlib import blake2b
 
 from pathlib import Path
 
@@ -96,6 +99,33 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/stable/topics/cache/
+# File based so every gunicorn worker on the host shares the same entries and invalidations.
+# Keys are prefixed per database so a fresh or different DB never reads another's entries,
+# and test runs get their own in-process cache
+
+_cache_db = DATABASES['default']
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('DJANGO_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'group26_cache')),
+        'KEY_PREFIX': blake2b(
+            f"{_cache_db['ENGINE']}:{_cache_db['HOST']}:{_cache_db['PORT']}:{_cache_db['NAME']}".encode(),
+            digest_size=8
+        ).hexdigest(),
+    }
+}
+
+if 'test' in sys.argv:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+
 # Password validation
 # https://docs.djangoproject.com/en/stable/ref/settings/#auth-password-validators
 